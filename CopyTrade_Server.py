@@ -1,64 +1,478 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from collections import OrderedDict, deque
 from datetime import datetime
+import itertools
 import threading
 import time
-import json
 import logging
+import logging.handlers
 import os
-from typing import Dict, List
+import queue
+import atexit
+import orjson
+import redis
 
 # Configuration
 API_KEY = os.environ.get("COPY_API_KEY", "change_me_secret")
 PORT = int(os.environ.get("PORT", 8000))
+REDIS_URL = os.environ.get("REDIS_URL")  # Set to share state between workers/instances
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))  # Per worker process
+STALE_TIMEOUT = 300  # 5 minutes without a heartbeat before an account is dropped
+STALE_TIMEOUT_NS = STALE_TIMEOUT * 1_000_000_000
+HEARTBEAT_DEBOUNCE_NS = 1_000_000_000  # Heartbeats closer together than 1s are acknowledged but not applied
+MAX_SIGNALS = 1000
+ACCOUNT_SHARDS = 16  # Lock stripes for the in-memory account map
+SIGNAL_STREAM_BATCH = 100  # Signals per chunk when streaming /signals
+ACCOUNTS_CACHE_TTL = 1.0  # Seconds a serialized /connected-accounts response is reused
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider that serializes through orjson instead of the stdlib json module"""
+    option = orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)  # jsonify() now dispatches through orjson
 CORS(app)  # Enable CORS for all routes
 
-# In-memory storage (for Railway, consider Redis for production)
-connected_accounts = {}
-recent_signals = []
-master_account = None
-accounts_lock = threading.Lock()
-signals_lock = threading.Lock()
+# Setup logging - request threads only enqueue records, a listener thread formats and writes them
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records untouched so message formatting also happens on the listener thread"""
+    
+    def prepare(self, record):
+        return record
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+log_queue = queue.SimpleQueue()
+log_output = logging.StreamHandler()
+log_output.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+log_listener = logging.handlers.QueueListener(log_queue, log_output)
+logging.basicConfig(level=logging.INFO, handlers=[DeferredQueueHandler(log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)  # Flush queued records on shutdown
 logger = logging.getLogger(__name__)
 
-# Background cleanup thread
+# Storage backends
+class MemoryStore:
+    """Process-local storage - only valid for a single worker process"""
+    
+    def __init__(self):
+        # Accounts are split across shards, each with its own writer lock, so
+        # requests for accounts in different shards never wait on each other.
+        # Adding or removing an account copies its shard and rebinds it, which
+        # lets readers use whatever shard dict is current without locking.
+        self.account_shards = [{} for _ in range(ACCOUNT_SHARDS)]
+        # Each account's '"id":{...}' JSON member, re-encoded whenever the account changes
+        self.member_shards = [{} for _ in range(ACCOUNT_SHARDS)]
+        self.shard_locks = [threading.Lock() for _ in range(ACCOUNT_SHARDS)]
+        self.recent_signals = deque(maxlen=MAX_SIGNALS)  # Oldest signal drops off automatically
+        self.signal_counter = itertools.count()
+        self.master_account = None
+        self.master_ids = set()  # Registered master accounts, so counts don't need a scan
+        self.master_lock = threading.Lock()
+        self.signals_lock = threading.Lock()
+    
+    @staticmethod
+    def _shard_index(account_id):
+        return hash(account_id) % ACCOUNT_SHARDS
+    
+    @staticmethod
+    def _encode_member(account):
+        return orjson.dumps(str(account['account_id'])) + b':' + orjson.dumps(format_account(account), option=OrjsonProvider.option)
+    
+    def _clear_master(self, account_id):
+        with self.master_lock:
+            if self.master_account and account_id == self.master_account:
+                self.master_account = None
+    
+    def register(self, account_data):
+        account_id = account_data['account_id']
+        account_data['last_seen_ns'] = time.monotonic_ns()  # Staleness clock, never serialized
+        index = self._shard_index(account_id)
+        with self.shard_locks[index]:
+            accounts = dict(self.account_shards[index])
+            accounts[account_id] = account_data
+            members = dict(self.member_shards[index])
+            members[account_id] = self._encode_member(account_data)
+            # Publish the new shards, each in one atomic rebind
+            self.account_shards[index] = accounts
+            self.member_shards[index] = members
+        with self.master_lock:
+            if account_data['is_master']:
+                self.master_account = account_id
+                self.master_ids.add(account_id)
+            else:
+                self.master_ids.discard(account_id)
+    
+    def heartbeat(self, account_id, data):
+        """Refresh an account, returns False if the account is unknown"""
+        index = self._shard_index(account_id)
+        with self.shard_locks[index]:
+            account = self.account_shards[index].get(account_id)
+            if account is None:
+                return False
+            # Updating fields in place leaves the shard's keys untouched, so no copy is needed
+            account.update(last_seen=time.time(),
+                           last_seen_ns=time.monotonic_ns(),
+                           equity=data.get('equity', account['equity']),
+                           profit=data.get('profit', account['profit']),
+                           status='connected')
+            # License data persists automatically - no need to update
+            self.member_shards[index][account_id] = self._encode_member(account)
+            return True
+    
+    def disconnect(self, account_id):
+        """Mark an account disconnected, returns its data or None if unknown"""
+        index = self._shard_index(account_id)
+        with self.shard_locks[index]:
+            account = self.account_shards[index].get(account_id)
+            if account is None:
+                return None
+            account['status'] = 'disconnected'
+            self.member_shards[index][account_id] = self._encode_member(account)
+        self._clear_master(account_id)
+        return account
+    
+    def get_account(self, account_id):
+        return self.account_shards[self._shard_index(account_id)].get(account_id)
+    
+    def refreshed_within(self, account_id, window_ns):
+        """True if a connected account was registered or refreshed in the last window_ns"""
+        account = self.get_account(account_id)
+        return (account is not None and account['status'] == 'connected'
+                and time.monotonic_ns() - account['last_seen_ns'] < window_ns)
+    
+    def get_master_account(self):
+        return self.master_account
+    
+    def accounts(self):
+        merged = {}
+        for accounts in self.account_shards:
+            merged.update(accounts)
+        return merged
+    
+    def account_counts(self):
+        """Return (total accounts, master accounts)"""
+        return sum(map(len, self.account_shards)), len(self.master_ids)
+    
+    def peek_account_ids(self, count):
+        """Return up to count account ids without copying the shards"""
+        return list(itertools.islice(itertools.chain.from_iterable(self.account_shards), count))
+    
+    def accounts_snapshot(self):
+        """Return (accounts JSON stitched from the pre-encoded members, total accounts, master accounts)"""
+        members = [member for members in self.member_shards for member in members.values()]
+        return b'{' + b','.join(members) + b'}', len(members), len(self.master_ids)
+    
+    def remove_stale(self):
+        """Drop accounts that have not sent a heartbeat within STALE_TIMEOUT"""
+        deadline = time.monotonic_ns() - STALE_TIMEOUT_NS
+        stale_accounts = []
+        for index, lock in enumerate(self.shard_locks):
+            with lock:
+                accounts = self.account_shards[index]
+                stale = {acc_id for acc_id, acc in accounts.items()
+                         if acc['last_seen_ns'] < deadline}
+                if stale:
+                    self.account_shards[index] = {acc_id: acc for acc_id, acc in accounts.items()
+                                                  if acc_id not in stale}
+                    self.member_shards[index] = {acc_id: member for acc_id, member in self.member_shards[index].items()
+                                                 if acc_id not in stale}
+            stale_accounts.extend(stale)
+        
+        with self.master_lock:
+            self.master_ids.difference_update(stale_accounts)
+        for acc_id in stale_accounts:
+            # Only clear master_account if the disconnected account was actually the master
+            self._clear_master(acc_id)
+        
+        return stale_accounts
+    
+    def add_signal(self, signal_data):
+        with self.signals_lock:
+            self.recent_signals.append(signal_data)
+    
+    def signals_since(self, cutoff_time):
+        """Return an iterator of JSON-encoded signals since cutoff_time, oldest first"""
+        with self.signals_lock:
+            signals = list(self.recent_signals)  # Snapshot, the deque can't be iterated while it changes
+        return (orjson.dumps(s, option=OrjsonProvider.option) for s in signals if s['timestamp'] >= cutoff_time)
+    
+    def signals_count(self):
+        return len(self.recent_signals)
+    
+    def next_signal_seq(self):
+        # next() on itertools.count is atomic under the GIL, no lock needed
+        return next(self.signal_counter)
+
+class RedisStore:
+    """Redis-backed storage shared by every worker pointed at the same server
+    
+    Accounts live in one hash per account (acct:{id}) whose fields hold
+    orjson-encoded values, indexed by the accounts:index set (masters are also
+    in masters:index). The 'master' key holds the orjson-encoded master id so
+    int and str ids come back exactly as the client sent them. Each hash expires
+    STALE_TIMEOUT seconds after its last heartbeat, so Redis drops stale
+    accounts by itself and no cleanup thread is needed. Signals are kept newest
+    first in the signals list.
+    """
+    
+    # Refresh a known account (and the master key if it points at it) in one round trip
+    HEARTBEAT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    if redis.call('GET', KEYS[2]) == ARGV[2] then
+        redis.call('EXPIRE', KEYS[2], ARGV[1])
+    end
+    return 1
+    """
+    
+    # Mark a known account disconnected and clear the master key if it points at it, atomically
+    # so an expired hash is never recreated without a TTL. Returns the account's fields or nil
+    DISCONNECT = """
+    local fields = redis.call('HGETALL', KEYS[1])
+    if #fields == 0 then
+        return false
+    end
+    redis.call('HSET', KEYS[1], 'status', ARGV[2])
+    if redis.call('GET', KEYS[2]) == ARGV[1] then
+        redis.call('DEL', KEYS[2])
+    end
+    return fields
+    """
+    
+    # Delete an account hash only if it is still missing account_id (a register may have won the race)
+    DROP_BROKEN = """
+    if redis.call('HEXISTS', KEYS[1], 'account_id') == 0 then
+        redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+    
+    def __init__(self, url):
+        # Under gevent a worker can have hundreds of requests in flight - a blocking pool makes
+        # them share a bounded set of sockets instead of opening one connection each
+        self.redis = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+            url, max_connections=REDIS_MAX_CONNECTIONS))
+        self.refresh_account = self.redis.register_script(self.HEARTBEAT)
+        self.disconnect_account = self.redis.register_script(self.DISCONNECT)
+        self.drop_broken = self.redis.register_script(self.DROP_BROKEN)
+        # account_id -> monotonic_ns of this worker's last write, oldest first. Only writes made
+        # by this worker are seen, so a disconnect handled elsewhere doesn't reset the debounce
+        self.last_refresh_ns = OrderedDict()
+        self.refresh_lock = threading.Lock()
+    
+    @staticmethod
+    def _key(account_id):
+        return f'acct:{account_id}'
+    
+    @staticmethod
+    def _encode(fields):
+        return {k: orjson.dumps(v) for k, v in fields.items()}
+    
+    @staticmethod
+    def _decode(fields):
+        return {k.decode(): orjson.loads(v) for k, v in fields.items()}
+    
+    def register(self, account_data):
+        account_id = account_data['account_id']
+        key = self._key(account_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self._encode(account_data))
+        pipe.expire(key, STALE_TIMEOUT)
+        pipe.sadd('accounts:index', account_id)
+        if account_data['is_master']:
+            pipe.set('master', orjson.dumps(account_id), ex=STALE_TIMEOUT)
+            pipe.sadd('masters:index', account_id)
+        else:
+            pipe.srem('masters:index', account_id)
+        pipe.execute()
+        self._mark_refreshed(account_id)
+    
+    def heartbeat(self, account_id, data):
+        """Refresh an account, returns False if the account is unknown"""
+        fields = {'last_seen': time.time(), 'status': 'connected'}
+        for field in ('equity', 'profit'):
+            if field in data:
+                fields[field] = data[field]
+        args = [STALE_TIMEOUT, orjson.dumps(account_id)]  # Compared against the encoded 'master' value
+        for field, value in self._encode(fields).items():
+            args += (field, value)
+        if not self.refresh_account(keys=[self._key(account_id), 'master'], args=args):
+            self._forget_refresh(account_id)
+            return False
+        self._mark_refreshed(account_id)
+        return True
+    
+    def disconnect(self, account_id):
+        """Mark an account disconnected, returns its data or None if unknown"""
+        self._forget_refresh(account_id)
+        fields = self.disconnect_account(keys=[self._key(account_id), 'master'],
+                                         args=[orjson.dumps(account_id), orjson.dumps('disconnected')])
+        if not fields:
+            return None
+        # HGETALL comes back from the script as a flat [field, value, ...] list
+        account = self._decode(dict(zip(fields[::2], fields[1::2])))
+        account['status'] = 'disconnected'
+        return account
+    
+    def get_account(self, account_id):
+        fields = self.redis.hgetall(self._key(account_id))
+        return self._decode(fields) if b'account_id' in fields else None
+    
+    def _mark_refreshed(self, account_id):
+        now = time.monotonic_ns()
+        with self.refresh_lock:
+            self.last_refresh_ns[account_id] = now
+            self.last_refresh_ns.move_to_end(account_id)
+            # Drop entries past the debounce window from the front so the map stays small
+            cutoff = now - HEARTBEAT_DEBOUNCE_NS
+            while next(iter(self.last_refresh_ns.values())) < cutoff:
+                self.last_refresh_ns.popitem(last=False)
+    
+    def _forget_refresh(self, account_id):
+        with self.refresh_lock:
+            self.last_refresh_ns.pop(account_id, None)
+    
+    def refreshed_within(self, account_id, window_ns):
+        """True if this worker registered or refreshed the account in the last window_ns"""
+        last_refresh = self.last_refresh_ns.get(account_id)
+        return last_refresh is not None and time.monotonic_ns() - last_refresh < window_ns
+    
+    def get_master_account(self):
+        master = self.redis.get('master')
+        return orjson.loads(master) if master else None
+    
+    def accounts(self):
+        """Fetch every indexed account, pruning ids whose hash has expired"""
+        account_ids = list(self.redis.smembers('accounts:index'))
+        # Non-transactional pipeline: one round trip, and each HGETALL names its own key
+        pipe = self.redis.pipeline(transaction=False)
+        for account_id in account_ids:
+            pipe.hgetall(self._key(account_id.decode()))
+        
+        accounts = {}
+        expired = []
+        broken = []
+        for account_id, fields in zip(account_ids, pipe.execute()):
+            if b'account_id' in fields:
+                account = self._decode(fields)
+                accounts[account['account_id']] = account
+            else:
+                # Gone, or a partial hash with no account_id - either way it can't be listed
+                expired.append(account_id)
+                if fields:
+                    broken.append(account_id)
+        
+        if expired:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.srem('accounts:index', *expired)
+            pipe.srem('masters:index', *expired)
+            pipe.execute()
+        for account_id in broken:
+            logger.warning("Dropping account hash without account_id: %s", account_id.decode())
+            self.drop_broken(keys=[self._key(account_id.decode())])
+        return accounts
+    
+    def account_counts(self):
+        """Return (total accounts, master accounts) from the index sizes
+        
+        Expired ids are only pruned from the indexes when accounts are fetched, so
+        these can briefly include accounts whose hash has already expired.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.scard('accounts:index')
+        pipe.scard('masters:index')
+        total, masters = pipe.execute()
+        return total, masters
+    
+    def peek_account_ids(self, count):
+        """Return up to count indexed account ids (may include ids not yet pruned)"""
+        return [account_id.decode() for account_id in self.redis.srandmember('accounts:index', count)]
+    
+    def accounts_snapshot(self):
+        """Return (accounts JSON, total accounts, master accounts), all from one fetch so they agree"""
+        accounts = self.accounts()
+        master_count = sum(1 for acc in accounts.values() if acc.get('is_master', False))
+        return orjson.dumps(format_accounts(accounts), option=OrjsonProvider.option), len(accounts), master_count
+    
+    def add_signal(self, signal_data):
+        pipe = self.redis.pipeline()
+        pipe.lpush('signals', orjson.dumps(signal_data))
+        pipe.ltrim('signals', 0, MAX_SIGNALS - 1)
+        pipe.execute()
+    
+    def signals_since(self, cutoff_time):
+        """Return an iterator of JSON-encoded signals since cutoff_time, oldest first"""
+        signals = reversed(self.redis.lrange('signals', 0, -1))
+        # Signals are already stored as JSON, so matches are passed on without re-encoding
+        return (s for s in signals if orjson.loads(s)['timestamp'] >= cutoff_time)
+    
+    def signals_count(self):
+        return self.redis.llen('signals')
+    
+    def next_signal_seq(self):
+        # Shared counter so ids stay unique across workers
+        return self.redis.incr('signals:seq')
+
+store = RedisStore(REDIS_URL) if REDIS_URL else MemoryStore()
+
+# Serialized /connected-accounts body as (time.monotonic() when built, bytes), swapped as one tuple
+accounts_cache = (None, b'')
+
+def invalidate_accounts_cache():
+    """Force the next /connected-accounts call to rebuild its response"""
+    global accounts_cache
+    accounts_cache = (None, b'')
+
+# Background cleanup thread (in-memory store only - Redis expires stale accounts itself)
 def cleanup_stale_connections():
     """Background thread to clean up stale connections every minute"""
-    global master_account, connected_accounts
-    
     while True:
         try:
             time.sleep(60)  # Run every minute
             
-            with accounts_lock:
-                current_time = datetime.now()
-                stale_accounts = []
-                
-                for acc_id, acc in connected_accounts.items():
-                    last_seen = datetime.fromisoformat(acc['last_seen'])
-                    if (current_time - last_seen).total_seconds() > 300:  # 5 minutes
-                        stale_accounts.append(acc_id)
-                
-                for acc_id in stale_accounts:
-                    del connected_accounts[acc_id]
-                    # Only clear master_account if the disconnected account was actually the master
-                    if master_account and acc_id == master_account:
-                        master_account = None
-                
-                if stale_accounts:
-                    logger.info(f"Cleaned up {len(stale_accounts)} stale connections: {stale_accounts}")
+            stale_accounts = store.remove_stale()
+            if stale_accounts:
+                invalidate_accounts_cache()
+                logger.info(f"Cleaned up {len(stale_accounts)} stale connections: {stale_accounts}")
                     
         except Exception as e:
             logger.error(f"Error in cleanup thread: {e}")
 
 # Start the cleanup thread when server starts
-cleanup_thread = threading.Thread(target=cleanup_stale_connections, daemon=True)
-cleanup_thread.start()
+if isinstance(store, MemoryStore):
+    cleanup_thread = threading.Thread(target=cleanup_stale_connections, daemon=True)
+    cleanup_thread.start()
+
+def format_account(account):
+    """Return a copy of a stored account with last_seen as an ISO string for API responses"""
+    formatted = dict(account)
+    formatted.pop('last_seen_ns', None)
+    formatted['last_seen'] = datetime.fromtimestamp(account['last_seen']).isoformat()
+    return formatted
+
+def format_accounts(accounts):
+    return {acc_id: format_account(acc) for acc_id, acc in accounts.items()}
+
+def read_json():
+    """Parse the request body with orjson, skipping Flask's content-type checks and stdlib json"""
+    body = request.get_data(cache=False)
+    return orjson.loads(body) if body else None
 
 def validate_api_key():
     """Validate API key from request headers"""
@@ -73,25 +487,22 @@ def handle_signal():
         return jsonify({'error': 'Invalid API key'}), 401
     
     try:
-        data = request.get_json()
+        data = read_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
         # Add timestamp and signal ID - SAFELY handle master_account
+        master_account = store.get_master_account()
         signal_data = {
-            'signal_id': f"sig_{int(time.time())}_{len(recent_signals)}",
+            'signal_id': f"sig_{int(time.time())}_{store.next_signal_seq()}",
             'timestamp': time.time(),
             'master_account': master_account if master_account else 'no_master',
             **data
         }
         
-        with signals_lock:
-            recent_signals.append(signal_data)
-            # Keep only last 1000 signals
-            if len(recent_signals) > 1000:
-                recent_signals.pop(0)
+        store.add_signal(signal_data)
         
-        logger.info(f"Signal received: {data.get('action')} {data.get('symbol')}")
+        logger.info("Signal received: %s %s", data.get('action'), data.get('symbol'))
         
         return jsonify({
             'status': 'success',
@@ -110,13 +521,25 @@ def get_signals():
         hours = request.args.get('hours', 24, type=int)
         cutoff_time = time.time() - (hours * 3600)
         
-        with signals_lock:
-            filtered_signals = [s for s in recent_signals if s['timestamp'] >= cutoff_time]
+        signals = store.signals_since(cutoff_time)
         
-        return jsonify({
-            'signals': filtered_signals,
-            'count': len(filtered_signals)
-        }), 200
+        def generate():
+            # Stream the JSON array in batches rather than building the whole body in memory
+            yield b'{"signals":['
+            count = 0
+            batch = []
+            for signal in signals:
+                batch.append(signal)
+                if len(batch) == SIGNAL_STREAM_BATCH:
+                    yield (b',' if count else b'') + b','.join(batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                yield (b',' if count else b'') + b','.join(batch)
+                count += len(batch)
+            yield b'],"count":%d}' % count
+        
+        return Response(generate(), mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -125,10 +548,8 @@ def get_signals():
 @app.route('/register', methods=['POST'])
 def register_account():
     """Register master or slave account"""
-    global master_account
-    
     try:
-        data = request.get_json()
+        data = read_json()
         account_id = data.get('account_id')
         name = data.get('name', 'Unknown')
         is_master = data.get('is_master', False)
@@ -141,7 +562,7 @@ def register_account():
             'name': name,
             'is_master': is_master,
             'connected_since': datetime.now().isoformat(),
-            'last_seen': datetime.now().isoformat(),
+            'last_seen': time.time(),  # Epoch seconds, formatted by format_account()
             'equity': data.get('equity', 0),
             'profit': data.get('profit', 0),
             'status': 'connected',
@@ -151,18 +572,18 @@ def register_account():
             'license_key': data.get('license_key')
         }
         
-        with accounts_lock:
-            if is_master:
-                master_account = account_id
-                logger.info(f"MASTER registered: {name} (ID: {account_id})")
-            else:
-                logger.info(f"SLAVE registered: {name} (ID: {account_id}) - License: {data.get('license_owner', 'None')}")
+        store.register(account_data)
+        invalidate_accounts_cache()
+        if is_master:
+            logger.info("MASTER registered: %s (ID: %s)", name, account_id)
+        else:
+            logger.info("SLAVE registered: %s (ID: %s) - License: %s", name, account_id, data.get('license_owner', 'None'))
             
-            connected_accounts[account_id] = account_data
-        
-        # DEBUG: Log current state after registration
-        logger.info(f"DEBUG - Total accounts after registration: {len(connected_accounts)}")
-        logger.info(f"DEBUG - Account IDs: {list(connected_accounts.keys())}")
+        # DEBUG: Log current state after registration (first few ids only, and never at INFO)
+        if logger.isEnabledFor(logging.DEBUG):
+            accounts_count, _ = store.account_counts()
+            logger.debug("Total accounts after registration: %d - first IDs: %s",
+                         accounts_count, store.peek_account_ids(5))
         
         return jsonify({
             'status': 'success',
@@ -177,27 +598,35 @@ def register_account():
 @app.route('/connected-accounts', methods=['GET'])
 def get_connected_accounts():
     """Get all connected accounts - FIXED: No cleanup during fetch"""
-    global master_account
+    global accounts_cache
     
     try:
         # REMOVED cleanup logic - it runs in background thread now
         # Just return the current state without modifying it
         
-        with accounts_lock:
-            accounts_copy = connected_accounts.copy()
+        # Heartbeats don't invalidate the cache, so equity/profit may lag by up to ACCOUNTS_CACHE_TTL
+        cached_at, body = accounts_cache
+        # Age the cache on the monotonic clock - a wall clock stepping back must not extend it
+        now = time.monotonic()
+        if cached_at is not None and now - cached_at < ACCOUNTS_CACHE_TTL:
+            return Response(body, mimetype='application/json')
+        
+        accounts_json, accounts_count, master_count = store.accounts_snapshot()
         
         # DEBUG: Log what we're returning
-        slave_count = sum(1 for acc in accounts_copy.values() if not acc.get('is_master', False))
-        master_count = sum(1 for acc in accounts_copy.values() if acc.get('is_master', False))
+        slave_count = accounts_count - master_count
         
-        logger.info(f"DEBUG - Returning {len(accounts_copy)} accounts ({master_count} masters, {slave_count} slaves)")
+        logger.info("DEBUG - Returning %d accounts (%d masters, %d slaves)", accounts_count, master_count, slave_count)
         
-        return jsonify({
-            'accounts': accounts_copy,
-            'total_count': len(accounts_copy),
-            'master_account': master_account,
+        body = orjson.dumps({
+            'accounts': orjson.Fragment(accounts_json),
+            'total_count': accounts_count,
+            'master_account': store.get_master_account(),
             'timestamp': time.time()
-        }), 200
+        }, option=OrjsonProvider.option)
+        accounts_cache = (now, body)
+        
+        return Response(body, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error in connected-accounts: {str(e)}")
@@ -207,24 +636,21 @@ def get_connected_accounts():
 def heartbeat():
     """Update account heartbeat"""
     try:
-        data = request.get_json()
+        data = read_json()
         account_id = data.get('account_id')
         
         if not account_id:
             return jsonify({'error': 'Account ID required'}), 400
         
-        with accounts_lock:
-            if account_id in connected_accounts:
-                connected_accounts[account_id]['last_seen'] = datetime.now().isoformat()
-                connected_accounts[account_id]['equity'] = data.get('equity', connected_accounts[account_id]['equity'])
-                connected_accounts[account_id]['profit'] = data.get('profit', connected_accounts[account_id]['profit'])
-                connected_accounts[account_id]['status'] = 'connected'
-                # License data persists automatically - no need to update
-                
-                # DEBUG: Log successful heartbeat
-                logger.debug(f"Heartbeat from {account_id}")
-            else:
-                logger.warning(f"Heartbeat from unknown account: {account_id}")
+        # Drop bursts of heartbeats without touching shared state - staleness is measured in minutes
+        if store.refreshed_within(account_id, HEARTBEAT_DEBOUNCE_NS):
+            return jsonify({'status': 'success', 'debounced': True}), 200
+        
+        if store.heartbeat(account_id, data):
+            # DEBUG: Log successful heartbeat
+            logger.debug("Heartbeat from %s", account_id)
+        else:
+            logger.warning("Heartbeat from unknown account: %s", account_id)
         
         return jsonify({'status': 'success'}), 200
         
@@ -234,28 +660,22 @@ def heartbeat():
 @app.route('/disconnect', methods=['POST'])
 def disconnect():
     """Handle account disconnect"""
-    global master_account
-    
     try:
-        data = request.get_json()
+        data = read_json()
         account_id = data.get('account_id')
         
         if not account_id:
             return jsonify({'error': 'Account ID required'}), 400
         
-        with accounts_lock:
-            if account_id in connected_accounts:
-                account_name = connected_accounts[account_id].get('name', 'Unknown')
-                is_master = connected_accounts[account_id].get('is_master', False)
-                
-                if is_master:
-                    logger.info(f"MASTER disconnected: {account_name} (ID: {account_id})")
-                else:
-                    logger.info(f"SLAVE disconnected: {account_name} (ID: {account_id})")
-                
-                connected_accounts[account_id]['status'] = 'disconnected'
-                if account_id == master_account:
-                    master_account = None
+        account = store.disconnect(account_id)
+        if account is not None:
+            invalidate_accounts_cache()
+            account_name = account.get('name', 'Unknown')
+            
+            if account.get('is_master', False):
+                logger.info("MASTER disconnected: %s (ID: %s)", account_name, account_id)
+            else:
+                logger.info("SLAVE disconnected: %s (ID: %s)", account_name, account_id)
         
         return jsonify({'status': 'success'}), 200
         
@@ -268,8 +688,11 @@ def get_master_status():
     """Get master account status"""
     try:
         master_data = None
-        if master_account and master_account in connected_accounts:
-            master_data = connected_accounts[master_account]
+        master_account = store.get_master_account()
+        if master_account:
+            master_data = store.get_account(master_account)
+            if master_data is not None:
+                master_data = format_account(master_data)
         
         return jsonify({
             'master_account': master_data,
@@ -283,10 +706,8 @@ def get_master_status():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    with accounts_lock:
-        accounts_count = len(connected_accounts)
-        slave_count = sum(1 for acc in connected_accounts.values() if not acc.get('is_master', False))
-        master_count = sum(1 for acc in connected_accounts.values() if acc.get('is_master', False))
+    accounts_count, master_count = store.account_counts()
+    slave_count = accounts_count - master_count
     
     return jsonify({
         'status': 'healthy',
@@ -294,20 +715,19 @@ def health_check():
         'accounts_count': accounts_count,
         'slave_count': slave_count,
         'master_count': master_count,
-        'signals_count': len(recent_signals),
-        'master_online': master_account is not None
+        'signals_count': store.signals_count(),
+        'master_online': store.get_master_account() is not None
     }), 200
 
 @app.route('/debug/accounts', methods=['GET'])
 def debug_accounts():
     """Debug endpoint to see all accounts in detail"""
-    with accounts_lock:
-        accounts_copy = connected_accounts.copy()
+    accounts_copy = store.accounts()
     
     return jsonify({
-        'accounts': accounts_copy,
+        'accounts': format_accounts(accounts_copy),
         'total_count': len(accounts_copy),
-        'master_account': master_account,
+        'master_account': store.get_master_account(),
         'timestamp': time.time()
     }), 200
 
@@ -328,5 +748,6 @@ def home():
 
 if __name__ == '__main__':
     logger.info(f"Starting Copy Trading Server on port {PORT}")
-    logger.info("Stale connection cleanup running in background thread")
+    if isinstance(store, MemoryStore):
+        logger.info("Stale connection cleanup running in background thread")
     app.run(host='0.0.0.0', port=PORT, debug=False)
@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+# Gunicorn settings - see Procfile
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# In-memory state is per process, so only run several workers when it lives in Redis
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1 if os.environ.get("REDIS_URL") else 1))
+worker_class = "gevent"  # Cooperative I/O so slow clients don't tie up a worker
+worker_connections = 1000